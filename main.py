@@ -1,17 +1,21 @@
 import argparse
-import io
 import sys
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Generator, Tuple
+from typing import Dict, NamedTuple, Tuple
 
 SIDE_GUARD = "101"
 MIDDLE_GUARD = "01010"
 UNITS_PER_SIDE = {"EAN-13": 42, "UPC-A": 42, "EAN-8": 28}
+TYPE_BY_NUMBER_OF_DIGITS = {13: "EAN-13", 12: "UPC-A", 8: "EAN-8"}
+# File extensions whose formats can store a 1-bit image as such; any other format gets an 8-bit grayscale image.
+ONE_BIT_SUFFIXES = {".png", ".bmp", ".gif", ".tif", ".tiff", ".pbm"}
 FONT_SIZE_FACTOR = 8
 EAN_13_LEADING_DIGIT_SHIFT = 7
 EAN_13_LEFT_BORDER_EXTENSION_FACTOR = 6
 TEXT_Y_OFFSET = 1.5
+ASCII_ZERO = ord("0")
 
 # Values for encoding the left-hand side of the barcode, in decimal.
 # For EAN-13, the values with key 0 have odd parity (Set A), while those with key 1 have even parity (Set B).
@@ -59,6 +63,28 @@ leading_digit_encoding = {
     9: 26
 }
 
+# The values above, precomputed as strings of 7 bits, so that digits can be encoded with a simple lookup.
+# The tables are flat tuples indexed by digit; left_encoding_bits holds both parities, at index (digit << 1) | parity.
+left_encoding_bits = tuple(format(left_encoding[digit][parity], "07b") for digit in range(10) for parity in (0, 1))
+right_encoding_bits = tuple(format(right_encoding[digit], "07b") for digit in range(10))
+
+# For every leading digit, the bit strings of all digits at each of the (up to 6) left-hand side positions, with the
+# parity already chosen according to leading_digit_encoding. Indexed as [leading digit][position][digit].
+left_side_encoding_bits = tuple(
+    tuple(tuple(left_encoding_bits[digit << 1 | leading_digit_encoding[leading_digit] >> (5 - position) & 1]
+                for digit in range(10))
+          for position in range(6))
+    for leading_digit in range(10)
+)
+
+
+class Border(NamedTuple):
+    """The width of the border (quiet area) on each side of the barcode, in pixels."""
+    left: int
+    right: int
+    top: int
+    bottom: int
+
 
 def main():
     arg_parser = argparse.ArgumentParser(description="EAN and UPC Barcode Generator")
@@ -116,6 +142,19 @@ def main():
             elif use_corrected == "N":
                 sys.exit()
     
+    # Splits the barcode into groups of digits according to the barcode's type.
+    # Element [0] is the EAN-13 leading digit ("0" if not EAN-13), [1] is left side digits, [2] is right side digits.
+    digit_groups: Tuple[str, str, str] = get_digit_groups(barcode, barcode_type)
+    
+    # Generates a string of 1s and 0s corresponding to the barcode's bars: 0 for white, 1 for black.
+    barcode_string = encode_barcode(*digit_groups)
+    
+    # If the user passed the -s | --bitstring parameter, outputs barcode_string and exits, before any of the image
+    # settings are processed.
+    if args.bitstring:
+        print(barcode_string)
+        sys.exit()
+    
     # If no output path has been passed, sets it to the currect working directory using the default file naming format.
     default_file_name = f"barcode_{barcode_type}_{barcode}.png"
     output_path: Path = Path(args.outputpath) if args.outputpath is not None else Path.cwd(
@@ -126,43 +165,30 @@ def main():
     # If the height of the notch is not specified, it will reach halfway down the digits, even if they're not visible.
     default_notch_height: int = int(unit_width * (FONT_SIZE_FACTOR + TEXT_Y_OFFSET * 2)) // 2
     notch_height: int = args.notch if args.notch is not None else default_notch_height
-    # Sets the width of all individual borders to args.border
-    border: Dict[str, int] = {side: args.border for side in ["Left", "Right", "Top", "Bottom"]}
-    # If a value has been provided for any individual border, changes it; this overwrites args.border's global setting.
-    border["Left"] = args.leftborder if args.leftborder is not None else border["Left"]
-    border["Right"] = args.rightborder if args.rightborder is not None else border["Right"]
-    border["Top"] = args.topborder if args.topborder is not None else border["Top"]
-    border["Bottom"] = args.bottomborder if args.bottomborder is not None else border["Bottom"]
+    # Sets the width of all individual borders to args.border, unless a value has been provided for that border; this
+    # overwrites args.border's global setting.
+    border: Border = Border(left=args.leftborder if args.leftborder is not None else args.border,
+                            right=args.rightborder if args.rightborder is not None else args.border,
+                            top=args.topborder if args.topborder is not None else args.border,
+                            bottom=args.bottomborder if args.bottomborder is not None else args.border)
     
     # If the text is to be drawn underneath the barcode and the barcode type is EAN-13, extends the left border to make
     # room for the extra digit.
     draw_digits: bool = args.nodigits
     if draw_digits and barcode_type == "EAN-13":
-        border["Left"] += unit_width * EAN_13_LEFT_BORDER_EXTENSION_FACTOR
-        
-    # Splits the barcode into groups of digits according to the barcode's type.
-    # Element [0] is the EAN-13 leading digit ("0" if not EAN-13), [1] is left side digits, [2] is right side digits.
-    digit_groups: Tuple[str, str, str] = get_digit_groups(barcode, barcode_type)
-    
-    # Generates a string of 1s and 0s corresponding to the barcode's bars: 0 for white, 1 for black.
-    barcode_string = encode_barcode(*digit_groups)
-    
-    # If the user passed the -s | --bitstring parameter, outputs barcode_string and exits.
-    if args.bitstring:
-        print(barcode_string)
-        sys.exit()
+        border = border._replace(left=border.left + unit_width * EAN_13_LEFT_BORDER_EXTENSION_FACTOR)
     
-    # Generates a string that encodes the barcode image (without any text) in the PBM format (1-bit monochrome).
-    pbm_data = generate_pbm_data(barcode_string,
-                                 border,
-                                 unit_width=unit_width,
-                                 barcode_height=barcode_height,
-                                 notch_height=notch_height,
-                                 type=barcode_type,
-                                 draw_digits=draw_digits)
+    # Generates bytes that encode the barcode image (without any text) as a packed 1-bit bitmap, along with its size.
+    image_size, bitmap_data = generate_bitmap_data(barcode_string,
+                                                   border,
+                                                   unit_width=unit_width,
+                                                   barcode_height=barcode_height,
+                                                   notch_height=notch_height,
+                                                   type=barcode_type,
+                                                   draw_digits=draw_digits)
     
-    # Loads the PBM data into Pillow and gets an Image object.
-    pillow_image = convert_to_pillow_image(pbm_data)
+    # Loads the bitmap data into Pillow and gets an Image object; it only needs to be grayscale if text will be drawn.
+    pillow_image = convert_to_pillow_image(bitmap_data, image_size, grayscale=draw_digits)
     
     # Unless the user passed the -d | --nodigits parameter, draws the digits as text onto the Pillow Image.
     if draw_digits:
@@ -199,11 +225,15 @@ def non_negative_int(n: int) -> int:
     return n
 
 
-def convert_to_pillow_image(pbm_data: str):
-    """Converts a PBM string into a Pillow Image object."""
-    pbm_memory_file = io.BytesIO(pbm_data.encode("utf-8"))        
-    pillow_image = Image.open(pbm_memory_file).convert("L") # Converts pillow_image to 8-bit grayscale
-    return pillow_image
+def convert_to_pillow_image(bitmap_data: bytes, size: Tuple[int, int], grayscale: bool=True):
+    """
+    Converts packed 1-bit bitmap data into a Pillow Image object.
+    The "1;I" raw mode tells Pillow that 1 bits are black, as in the PBM format, rather than white.
+    If grayscale is True, converts the image to 8-bit grayscale (needed for antialiased text), otherwise leaves it
+    1-bit.
+    """
+    pillow_image = Image.frombytes("1", size, bitmap_data, "raw", "1;I")
+    return pillow_image.convert("L") if grayscale else pillow_image
 
 
 def save_pillow_image(image, path: Path):
@@ -222,8 +252,18 @@ def save_pillow_image(image, path: Path):
                 break
             elif reply == "N":
                 sys.exit()
+    # PBM is a 1-bit format, but Pillow would write an 8-bit grayscale (PGM) file unless the image is 1-bit as well.
+    if path.suffix.lower() == ".pbm":
+        image = image.convert("1", dither=Image.Dither.NONE)
+    # Some formats (such as EPS) reject 1-bit images, and others (such as PGM or PPM) would store them under the wrong
+    # extension, so those get the image converted back to 8-bit grayscale.
+    elif image.mode == "1" and path.suffix.lower() not in ONE_BIT_SUFFIXES:
+        image = image.convert("L")
+    # Barcodes compress well even at zlib's fastest level, which saves PNGs about 40% faster than Pillow's default
+    # level, at the cost of files about 50% larger.
+    save_options: Dict[str, int] = {"compress_level": 1} if path.suffix.lower() == ".png" else {}
     try:
-        image.save(path)
+        image.save(path, **save_options)
     except ValueError:
         sys.exit(f"Error: \"{path.suffix}\": incorrect or unsupported file format.")
     except OSError as e:
@@ -233,25 +273,34 @@ def save_pillow_image(image, path: Path):
             sys.exit("Error: file could not be written.")
 
 
+@lru_cache(maxsize=32)
+def load_font(font_size: int):
+    """
+    Loads the OCR-B font at the specified size.
+    Fonts are cached, so that the font file is only read once per size.
+    """
+    return ImageFont.truetype("OCR-B.ttf", font_size)
+
+
 def draw_digit_text(image,
                     leading_digit: str,
                     left_digits: str,
                     right_digits: str,
-                    border: Dict[str, int],
+                    border: Border,
                     unit_width: int,
                     barcode_height: int,
                     barcode_type: str):
     """Draws the optional text underneath the barcode."""
     font_size: int = unit_width * FONT_SIZE_FACTOR
-    leading_digit_x: int = border["Left"] - (unit_width * EAN_13_LEADING_DIGIT_SHIFT)
+    leading_digit_x: int = border.left - (unit_width * EAN_13_LEADING_DIGIT_SHIFT)
     # Shifts the text to the right by +1 unit because the side guard ends with a black bar and would touch the text.
-    left_text_x: int = border["Left"] + unit_width * (len(SIDE_GUARD) + 1)
-    right_text_x: int = border["Left"] + unit_width * (UNITS_PER_SIDE[barcode_type] + len(SIDE_GUARD) +
+    left_text_x: int = border.left + unit_width * (len(SIDE_GUARD) + 1)
+    right_text_x: int = border.left + unit_width * (UNITS_PER_SIDE[barcode_type] + len(SIDE_GUARD) +
                                                        len(MIDDLE_GUARD))
-    text_y: int = border["Top"] + barcode_height + int(unit_width * TEXT_Y_OFFSET)
+    text_y: int = border.top + barcode_height + int(unit_width * TEXT_Y_OFFSET)
     
     try:
-        font = ImageFont.truetype("OCR-B.ttf", font_size)
+        font = load_font(font_size)
     except OSError:
         sys.exit("Error: cannot find the font file \"OCR-B.ttf\". "
                  "Make sure that it's in the same directory as the script.\n"
@@ -277,51 +326,43 @@ def get_digit_groups(barcode_number: str, barcode_type: str) -> tuple[str, str,
 def checksum_is_correct(barcode_number: str, return_corrected: bool=False) -> bool | str:
     """Returns True if the checksum number is correct. If return_corrected is True, returns a corrected barcode."""
     # Gets the last digit of the barcode, which is the check digit
-    check_digit: int = int(barcode_number[-1])
-    # Removes the last digit and reverses the order of the remaining numbers
-    barcode_number = barcode_number[-2::-1]
-    checksum: int = 0
-    for i, digit in enumerate(barcode_number):
-        checksum += int(digit) * 3 if i % 2 == 0 else int(digit)
+    check_digit: int = ord(barcode_number[-1]) - ASCII_ZERO
+    # Removes the last digit; indexing bytes gives ASCII codes, not str
+    digits: bytes = barcode_number[:-1].encode("ascii")
+    # Counting from the right, every other digit is weighted 3 (starting with the rightmost one), the rest 1.
+    # ASCII_ZERO is subtracted once per weight to turn ASCII codes into digits.
+    first_weighted_3: int = (len(digits) - 1) % 2
+    weighted_3: bytes = digits[first_weighted_3::2]
+    weighted_1: bytes = digits[1 - first_weighted_3::2]
+    checksum: int = (3 * sum(weighted_3) + sum(weighted_1) -
+                     ASCII_ZERO * (3 * len(weighted_3) + len(weighted_1)))
     checksum = 0 if (checksum % 10) == 0 else 10 - (checksum % 10)
     if check_digit == checksum:
         return True
     else:
         if return_corrected:
-            return f"{barcode_number[::-1]}{checksum}"
+            return f"{barcode_number[:-1]}{checksum}"
         return False
 
 
 def get_type(barcode: str) -> str:
     """If the number is a valid barcode number, returns its type."""
-    if not barcode.isnumeric():
+    # Only ASCII digits are accepted; isdigit alone would also accept other Unicode digits, such as "²" or "١".
+    if not (barcode.isascii() and barcode.isdigit()):
         raise ValueError("Barcode number must be numeric and a positive integer.")
-    number_of_digits: int = len(barcode)
-    match number_of_digits:
-        case 13:
-            return "EAN-13"
-        case 12:
-            return "UPC-A"
-        case 8:
-            return "EAN-8"
-        case _:
-            raise ValueError("Incorrect number of digits.")
+    barcode_type: str | None = TYPE_BY_NUMBER_OF_DIGITS.get(len(barcode))
+    if barcode_type is None:
+        raise ValueError("Incorrect number of digits.")
+    return barcode_type
         
 
-def get_bits(number: int, length: int) -> Generator[int, None, None]:
-    """Generates the specified number of bits of a number, starting with the least significant bit."""
-    for i in range(length - 1, -1, -1):
-        yield number >> i & 1
-
-
 def encode_digit(digit: int, parity=None) -> str:
     """
     Encodes a digit into a string of 7 bits and returns it. If the optional keyword argument "parity" is provided
     (0 or 1), uses left-hand encoding and returns a bit string with the requested parity.
     If no "parity" keyword argument is provided, uses right-hand encoding.
     """
-    value: int = left_encoding[digit][parity] if parity is not None else right_encoding[digit]
-    return "".join(str(bit) for bit in get_bits(value, 7))
+    return left_encoding_bits[digit << 1 | parity] if parity is not None else right_encoding_bits[digit]
 
 
 def encode_left_side(leading_digit: str, left_digits: str) -> str:
@@ -330,64 +371,80 @@ def encode_left_side(leading_digit: str, left_digits: str) -> str:
     The leading digit is encoded as a combination of left and right parity values of the other 6 digits.
     The encoding follows the values of bits of the numbers in ean_13_encoding.
     For example, 5 would translate to 101, or "even", "odd", "even".
-    Then uses the bit as the key to get the correct value from left_encoding.
+    The parity for every position is resolved in advance, in left_side_encoding_bits.
     """
-    output: str = ""
-    for i, digit in enumerate(left_digits):
-        # Gets the bit to be used as the key to get the correct value from left_encoding.
-        parity: int = leading_digit_encoding[int(leading_digit)] >> (5 - i) & 1
-        output += encode_digit(int(digit), parity)
-    return output
+    positions: Tuple[Tuple[str, ...], ...] = left_side_encoding_bits[ord(leading_digit) - ASCII_ZERO]
+    # Iterating over bytes gives ASCII codes, which are turned into digits by subtracting the code of "0".
+    return "".join([positions[i][digit - ASCII_ZERO] for i, digit in enumerate(left_digits.encode("ascii"))])
 
 
 def encode_right_side(right_digits: str) -> str:
     """Encodes the right-hand side of the barcode (the final 6 digits) and returns a string of bits."""
-    return "".join(encode_digit(int(digit)) for digit in right_digits)
+    return "".join([right_encoding_bits[digit - ASCII_ZERO] for digit in right_digits.encode("ascii")])
 
 
+@lru_cache(maxsize=4096)
 def encode_barcode(leading_digit: str, left_digits: str, right_digits: str) -> str:
-    """Returns the entire barcode as a string of bits."""
+    """Returns the entire barcode as a string of bits. Results are cached, as a given number always encodes the same."""
     left_side: str = encode_left_side(leading_digit, left_digits)
     right_side: str = encode_right_side(right_digits)
     return f"{SIDE_GUARD}{left_side}{MIDDLE_GUARD}{right_side}{SIDE_GUARD}"
 
 
+def expand_bits(bit_string: str, unit_width: int) -> str:
+    """Repeats every bit in the string unit_width times, so that each bit becomes a unit_width pixels wide bar."""
+    return bit_string.translate(str.maketrans({"0": "0" * unit_width, "1": "1" * unit_width}))
+
+
+@lru_cache(maxsize=32)
 def generate_notches(unit_width: int, type: str) -> str:
     """Generates text notches (extensions of the side and middle guards making room for the optional text.)"""
-    side: str = "".join(bit * unit_width for bit in SIDE_GUARD)
-    middle: str = "".join(bit * unit_width for bit in MIDDLE_GUARD)
+    side: str = expand_bits(SIDE_GUARD, unit_width)
+    middle: str = expand_bits(MIDDLE_GUARD, unit_width)
     empty_space: str = "0" * UNITS_PER_SIDE[type] * unit_width
     return f"{side}{empty_space}{middle}{empty_space}{side}"
     
 
-def generate_pbm_data(bit_string: str,
-                      border: Dict[str, int],
-                      type: str="EAN-13",
-                      unit_width: int=6,
-                      barcode_height: int=400,
-                      notch_height: int=0,
-                      draw_digits: bool=True) -> str:
+@lru_cache(maxsize=128)
+def pack_bits(bit_string: str) -> bytes:
+    """
+    Packs a string of bits into bytes, 8 bits per byte, starting with the most significant bit.
+    If the length of the string is not a multiple of 8, the final byte is padded with 0s, so that each line of a bitmap
+    starts on a new byte.
+    Results are cached, since the empty and notch lines are the same for every barcode with the same dimensions.
+    """
+    length: int = (len(bit_string) + 7) // 8
+    return int(bit_string.ljust(length * 8, "0"), 2).to_bytes(length, "big")
+
+
+def generate_bitmap_data(bit_string: str,
+                         border: Border,
+                         type: str="EAN-13",
+                         unit_width: int=6,
+                         barcode_height: int=400,
+                         notch_height: int=0,
+                         draw_digits: bool=True) -> Tuple[Tuple[int, int], bytes]:
     """
-    Returns a string containing the barcode image data in PBM format.
-    This data can be saved to a .pbm file directly or loaded into Pillow for further enhancement or format conversion.
+    Returns the size of the barcode image, as (width, height), and its pixels as a packed 1-bit bitmap, where each line
+    starts on a new byte and a 1 bit is a black pixel (the same layout as the pixel data of a binary PBM file).
+    This data can be loaded directly into Pillow for further enhancement or format conversion.
     """
-    width: int = len(bit_string) * unit_width + border["Left"] + border["Right"]
+    width: int = len(bit_string) * unit_width + border.left + border.right
     height_extension: int = max(int(unit_width * (FONT_SIZE_FACTOR + TEXT_Y_OFFSET) * draw_digits), notch_height)
-    height: int = barcode_height + height_extension + border["Top"] + border["Bottom"]
-    left_border: str = "0" * border["Left"]
-    right_border: str = "0" * border["Right"]
-    top_border_lines: str = (("0" * width) + "\n") * border["Top"]
-    bottom_border_lines: str = (("0" * width) + "\n") * (border["Bottom"] + height_extension)
-    barcode_lines: str = (left_border + "".join(bit * unit_width for bit in bit_string) + right_border +
-                          "\n") * barcode_height
+    height: int = barcode_height + height_extension + border.top + border.bottom
+    left_border: str = "0" * border.left
+    right_border: str = "0" * border.right
+    # Every line of a given kind is identical, so each one is built and packed only once, then repeated as bytes.
+    empty_line: bytes = pack_bits("0" * width)
+    barcode_line: bytes = pack_bits(left_border + expand_bits(bit_string, unit_width) + right_border)
+    notch_line: bytes = (pack_bits(left_border + generate_notches(unit_width, type) + right_border) if notch_height
+                         else b"")
     
-    pbm_data: str = f"P1\n# {type} BARCODE\n{width} {height}\n"
-    pbm_data += top_border_lines
-    pbm_data += barcode_lines
-    if notch_height:
-        pbm_data += ("".join((left_border, generate_notches(unit_width, type), right_border, "\n"))) * notch_height
-    pbm_data += bottom_border_lines
-    return pbm_data
+    # Joins all the parts at once, so that the image data is copied only once.
+    return (width, height), b"".join((empty_line * border.top,
+                                      barcode_line * barcode_height,
+                                      notch_line * notch_height,
+                                      empty_line * (border.bottom + height_extension)))
     
 
 if __name__ == "__main__":
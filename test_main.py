@@ -1,5 +1,21 @@
 import pytest
-from main import checksum_is_correct, get_type, get_bits, encode_digit, encode_left_side, encode_right_side
+from pathlib import Path
+from PIL import Image
+from main import (checksum_is_correct, get_type, encode_digit, encode_left_side, encode_right_side,
+                  expand_bits, pack_bits, Border, encode_barcode, get_digit_groups, generate_bitmap_data,
+                  convert_to_pillow_image, save_pillow_image, draw_digit_text)
+
+
+def make_barcode_image(draw_digits: bool):
+    """Returns the image of the EAN-8 barcode 96385074 as main would, with or without human-readable digits."""
+    border = Border(20, 20, 20, 20)
+    digit_groups = get_digit_groups("96385074", "EAN-8")
+    image_size, bitmap_data = generate_bitmap_data(encode_barcode(*digit_groups), border, type="EAN-8",
+                                                   unit_width=2, barcode_height=40, draw_digits=draw_digits)
+    image = convert_to_pillow_image(bitmap_data, image_size, grayscale=draw_digits)
+    if draw_digits:
+        draw_digit_text(image, *digit_groups, border, 2, 40, "EAN-8")
+    return image
 
 
 def test_checksum_is_correct():
@@ -22,14 +38,10 @@ def test_get_type():
         get_type("12345")
     with pytest.raises(ValueError):
         get_type("43518432135497")
+    with pytest.raises(ValueError):
+        get_type("９６３８５０７４")
         
 
-def test_get_bits():
-    assert "".join(str(bit) for bit in get_bits(15, 8)) == "00001111"
-    assert "".join(str(bit) for bit in get_bits(115, 8)) == "01110011"
-    assert "".join(str(bit) for bit in get_bits(26, 5)) == "11010"
-
-
 def test_encode_digit():
     assert encode_digit(4) == "1011100"
     assert encode_digit(4, 0) == "0100011"
@@ -46,3 +58,41 @@ def test_encode_right_side():
     assert encode_right_side("004474") == "111001011100101011100101110010001001011100"
     assert encode_right_side("530107") == "100111010000101110010110011011100101000100"
     assert encode_right_side("110035") == "110011011001101110010111001010000101001110"
+
+
+def test_expand_bits():
+    assert expand_bits("101", 1) == "101"
+    assert expand_bits("101", 3) == "111000111"
+    assert expand_bits("01010", 2) == "0011001100"
+
+
+def test_pack_bits():
+    assert pack_bits("10100110") == b"\xa6"
+    assert pack_bits("101") == b"\xa0"
+    assert pack_bits("111111111") == b"\xff\x80"
+
+
+def test_save_pillow_image_without_digits(tmp_path):
+    save_pillow_image(make_barcode_image(draw_digits=False), tmp_path / "barcode.eps")
+    assert (tmp_path / "barcode.eps").read_bytes().startswith(b"%!PS")
+    save_pillow_image(make_barcode_image(draw_digits=False), tmp_path / "barcode.pgm")
+    assert (tmp_path / "barcode.pgm").read_bytes().startswith(b"P5")
+    assert Image.open(tmp_path / "barcode.pgm").mode == "L"
+
+
+@pytest.mark.parametrize("draw_digits", [True, False])
+def test_save_pillow_image_pbm(tmp_path, monkeypatch, draw_digits):
+    # The font file is looked up in the working directory, which is where the script lives.
+    monkeypatch.chdir(Path(__file__).parent)
+    save_pillow_image(make_barcode_image(draw_digits), tmp_path / "barcode.pbm")
+    assert (tmp_path / "barcode.pbm").read_bytes().startswith(b"P4")
+    assert Image.open(tmp_path / "barcode.pbm").mode == "1"
+
+
+def test_save_pillow_image_png(tmp_path):
+    image = make_barcode_image(draw_digits=False)
+    save_pillow_image(image, tmp_path / "barcode.png")
+    with Image.open(tmp_path / "barcode.png") as saved:
+        assert saved.format == "PNG"
+        assert saved.mode == "1"
+        assert saved.tobytes() == image.tobytes()